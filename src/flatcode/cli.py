@@ -1,14 +1,19 @@
 # src/flatcode/cli.py
 import sys
 import argparse
+import heapq
 import os
+from operator import attrgetter
 from pathlib import Path
 
 # Module imports
 from flatcode.core.ignore import bootstrap_mergeignore, load_ignore_spec
 from flatcode.core.scanner import ProjectScanner
 from flatcode.core.tree import generate_project_tree
+from flatcode.core.writer import write_context
 from flatcode.models import FileContext
+from flatcode.utils.cache import TokenCache
+from flatcode.utils.tokenizer import Tokenizer
 
 def create_arg_parser():
     parser = argparse.ArgumentParser(
@@ -26,6 +31,12 @@ def create_arg_parser():
     
     parser.add_argument("-e", "--extensions", type=str, default="*", help="Comma-separated file extensions or '*' for all")
     parser.add_argument("-y", "--yes", action="store_true", help="Skip confirmation")
+    parser.add_argument(
+        "--fast-tokens",
+        action="store_true",
+        help="Estimate tokens as bytes/4 instead of running the tokenizer (skips the tokenizer pass; files are still read and UTF-8 checked)"
+    )
+    parser.add_argument("--no-cache", action="store_true", help="Don't reuse or store token counts between runs")
     return parser
 
 def get_default_output_name(root_dir: Path) -> str:
@@ -69,16 +80,28 @@ def main():
         print(f"Scanning: {root_dir}")
         print(f"Output:   {output_file.name}") # 提示用户输出文件名
         print(f"Mode:     {'All non-ignored text files' if '*' in extensions else f'Extensions {extensions}'}")
+        print(f"Tokens:   {'Estimated (bytes/4)' if args.fast_tokens else 'tiktoken'}")
 
         # 2. Ignore Rules (Using PathSpec)
         # 传入 output_file_name 而不是 args.output，确保动态生成的文件名被添加到 ignore
-        mergeignore_file = bootstrap_mergeignore(root_dir, output_file_name)
+        mergeignore_file = bootstrap_mergeignore(root_dir, output_file_name, assume_yes=args.yes)
         
         # Load spec and inject the output filename as an extra pattern to ignore
         ignore_spec = load_ignore_spec(mergeignore_file, extra_patterns=[output_file_name])
 
         # 3. Scanning
-        scanner = ProjectScanner(root_dir, ignore_spec, extensions)
+        # Estimates are free to recompute; only real tokenizer counts are cached.
+        token_cache = None
+        if not args.fast_tokens and not args.no_cache:
+            encoding_name = Tokenizer.encoding_name()
+            if encoding_name:
+                token_cache = TokenCache(root_dir, encoding_name)
+
+        scanner = ProjectScanner(
+            root_dir, ignore_spec, extensions,
+            fast_tokens=args.fast_tokens,
+            token_cache=token_cache,
+        )
         files_to_merge: list[FileContext] = list(scanner.scan())
         
         if not files_to_merge:
@@ -86,13 +109,14 @@ def main():
             return
 
         # 4. Review & Stats
-        files_to_merge.sort(key=lambda x: x.token_count, reverse=True)
+        # Only the Top 10 needs ranking; files are written in scan (path) order.
+        top_files = heapq.nlargest(10, files_to_merge, key=attrgetter("token_count"))
         total_tokens = sum(f.token_count for f in files_to_merge)
 
         print("\n--- Top 10 Largest Files (Est. Tokens) ---")
         print(f"{'Rank':<5} | {'Tokens':<10} | {'File Path'}")
         print("-" * 60)
-        for i, f in enumerate(files_to_merge[:10]):
+        for i, f in enumerate(top_files):
             print(f"{i+1:<5} | {f.token_count:<10} | {f.rel_path}")
         print("-" * 60)
         print(f"Total files: {len(files_to_merge)}")
@@ -106,17 +130,11 @@ def main():
         tree_str = generate_project_tree([f.rel_path for f in files_to_merge], root_dir.name)
         
         try:
-            with open(output_file, "w", encoding="utf-8") as f:
-                f.write(f"# --- flatcode Context ---\n")
-                f.write(f"# Files: {len(files_to_merge)} | Tokens: {total_tokens}\n")
-                f.write(f"# --- Project Tree ---\n")
-                f.write(tree_str)
-                f.write(f"# --- Context Start ---\n\n")
-                
-                for fc in files_to_merge:
-                    f.write(f"--- File: {fc.rel_path} ---\n\n")
-                    f.write(fc.content)
-                    f.write(f"\n\n--- End: {fc.rel_path} ---\n\n")
+            written_files, written_tokens = write_context(output_file, files_to_merge, tree_str, total_tokens)
+            if written_files != len(files_to_merge):
+                skipped = len(files_to_merge) - written_files
+                print(f"Written files: {written_files} ({skipped} skipped, unreadable at write time)")
+                print(f"Written tokens: {written_tokens}")
             print(f"\nSuccess! Context written to: {output_file.name}")
             
         except IOError as e:
@@ -1,5 +1,9 @@
 # src/flatcode/config.py
 
+# Temp files written next to .mergeignore while it is replaced atomically.
+# Always ignored, so one left behind by a killed run never reaches the output.
+TEMP_FILE_PATTERN = ".flatcode-*.tmp"
+
 DEFAULT_IGNORE_PATTERNS = [
     "# Default ignore patterns",
     ".git/",
@@ -15,4 +19,5 @@ DEFAULT_IGNORE_PATTERNS = [
     "*.log",
     "logs/",
     "*_context.txt",
+    TEMP_FILE_PATTERN,
 ]
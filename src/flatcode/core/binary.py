@@ -0,0 +1,43 @@
+# src/flatcode/core/binary.py
+from typing import Dict
+
+# Leading signatures of common binary formats (the same table idea as libmagic
+# and puremagic). A hit settles the question from the first few bytes, before
+# any scan of the sniffed head. Only signatures that cannot plausibly start a
+# text file are listed (e.g. no "MZ" or "BZh").
+_MAGIC: Dict[bytes, str] = {
+    b"\x89PNG\r\n\x1a\n": "png",
+    b"\xff\xd8\xff": "jpeg",
+    b"GIF87a": "gif",
+    b"GIF89a": "gif",
+    b"PK\x03\x04": "zip",
+    b"\x1f\x8b": "gzip",
+    b"\xfd7zXZ\x00": "xz",
+    b"7z\xbc\xaf\x27\x1c": "7z",
+    b"\x7fELF": "elf",
+    b"\xca\xfe\xba\xbe": "java-class",
+    b"\xcf\xfa\xed\xfe": "mach-o",
+    b"%PDF-": "pdf",
+    b"\x00asm": "wasm",
+}
+# bytes.startswith() takes a tuple and checks every signature in one C call.
+_MAGIC_PREFIXES = tuple(_MAGIC)
+
+# Bytes that occur in text (the file(1) heuristic): printable ASCII, the usual
+# control characters, and everything >= 0x80 so that UTF-8 passes. A head with
+# more than BINARY_CONTROL_RATIO of other bytes is treated as binary.
+_TEXT_CHARS = bytes({7, 8, 9, 10, 12, 13, 27} | set(range(0x20, 0x7F)) | set(range(0x80, 0x100)))
+BINARY_CONTROL_RATIO = 0.3
+
+def is_binary_head(head: bytes) -> bool:
+    """
+    Classifies a file from its leading bytes. Returns True if likely binary.
+
+    Checks run cheapest first: a known magic signature, then a NUL byte (the
+    same heuristic git uses), then the share of control bytes, which catches
+    binaries without NULs.
+    """
+    if head.startswith(_MAGIC_PREFIXES) or b'\0' in head:
+        return True
+    # translate() with a delete table runs in C and leaves only the non-text bytes.
+    return len(head.translate(None, _TEXT_CHARS)) > len(head) * BINARY_CONTROL_RATIO
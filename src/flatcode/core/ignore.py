@@ -1,15 +1,297 @@
 # src/flatcode/core/ignore.py
+import os
+import re
 import sys
+import tempfile
+import threading
 from pathlib import Path
-from typing import List, Optional
+from functools import lru_cache
+from typing import Callable, FrozenSet, Iterable, List, Optional, Set, Tuple
 import pathspec
-from flatcode.config import DEFAULT_IGNORE_PATTERNS
+from flatcode.config import DEFAULT_IGNORE_PATTERNS, TEMP_FILE_PATTERN
 
-def bootstrap_mergeignore(root_dir: Path, output_filename: str) -> Path:
+try:
+    # Optional: google-re2 matches in linear time, with no backtracking.
+    import re2
+except ImportError:
+    re2 = None
+
+try:
+    # Optional: Hyperscan matches all rules in one automaton pass.
+    import hyperscan
+except ImportError:
+    hyperscan = None
+
+# Rule count above which the combined regex goes to re2 when it is installed.
+# Small alternations are cheap for `re`; large ones are where backtracking hurts.
+RE2_MIN_RULES = 16
+
+# Backend for exclude-only rule sets: "re", "re2", "hyperscan", or unset for
+# automatic (re2 above RE2_MIN_RULES, else re). A requested backend that is
+# not installed or rejects the rules falls back to the automatic choice.
+MATCHER_ENV = "FLATCODE_MATCHER"
+
+# Rules that are a plain file or directory name, with no wildcard, escape or
+# inner slash ("node_modules/", ".DS_Store"). They need no regex: the name is
+# compared against path segments. All-dot names are left to pathspec.
+_LITERAL_NAME_RE = re.compile(r"[\w.-]*[\w-][\w.-]*/?", re.ASCII)
+# Plain-name rule count from which they are matched by set lookup instead of
+# regex. Below it the combined regex is faster: `re` checks literal
+# alternatives cheaply, and splitting the path costs more than it saves.
+LITERAL_MIN_RULES = 64
+
+# pathspec tags directory matches with named groups (e.g. "(?P<ps_d>/)"); the
+# same name repeated across patterns is illegal in one regex, so strip them.
+_NAMED_GROUP_RE = re.compile(r"\(\?P<\w+>")
+
+# Runs of two or more '*' inside a path segment.
+_STAR_RUN_RE = re.compile(r"\*{2,}")
+
+def _normalize_pattern(line: str) -> str:
+    """
+    Collapses redundant wildcards in one ignore pattern before it is compiled.
+
+    A '**' segment already matches any number of directories, so repeated
+    '**/**/' segments are folded into one, and a star run that is not a whole
+    '**' segment means the same as a single '*'. Both spellings produce
+    regexes with nested wildcards that backtrack badly on long paths, which is
+    the classic fnmatch/glob blowup. Comments and patterns with escapes are
+    left untouched. A leading '!' or '/' is set aside while the segments are
+    rewritten, so "!**/x" keeps its '**' segment.
+    """
+    line = line.rstrip("\r\n")
+    if "**" not in line or line.startswith("#") or "\\" in line:
+        return line
+
+    prefix = ""
+    if line.startswith("!"):
+        prefix, line = "!", line[1:]
+    if line.startswith("/"):
+        prefix, line = prefix + "/", line[1:]
+
+    segments = [
+        seg if seg == "**" else _STAR_RUN_RE.sub("*", seg)
+        for seg in line.split("/")
+    ]
+    collapsed: List[str] = []
+    for seg in segments:
+        if seg == "**" and collapsed and collapsed[-1] == "**":
+            continue
+        collapsed.append(seg)
+    return prefix + "/".join(collapsed)
+
+# Prefix pathspec gives unanchored rules ("*.log", "node_modules/"): any number
+# of leading directories.
+_ANY_DIRS_PREFIX = "(?:.+/)?"
+# Turns an unanchored regex into one that is matched from the start of the path.
+_UNANCHORED_PREFIX = "(?s:.*?)"
+
+def _combine_regexes(regexes: List[str], backend: str = ""):
+    """
+    Builds one regex, used with `.match()`, equivalent to "any of *regexes*
+    matches" under PathSpec's `.search()` semantics. Regexes anchored with '^'
+    are kept as they are; the rest ("*/" compiles to "(?P<ps_d>/)") get a lazy
+    "anything" prefix so they may still match anywhere in the path.
+
+    Anchored alternatives sharing the "any leading directories" prefix are
+    grouped under a single copy of it, so the regex engine scans the candidate
+    slash positions once for all of them instead of once per rule.
+
+    Above RE2_MIN_RULES rules (or always, for backend "re2") the result is
+    compiled with re2 if available; both objects expose the same `.match()`.
+    """
+    anywhere: List[str] = []
+    anchored: List[str] = []
+    for regex in regexes:
+        body = _NAMED_GROUP_RE.sub("(?:", regex)
+        if not body.startswith("^"):
+            anchored.append(_UNANCHORED_PREFIX + f"(?:{body})")
+            continue
+        body = body[1:]
+        if body.startswith(_ANY_DIRS_PREFIX):
+            anywhere.append(body[len(_ANY_DIRS_PREFIX):])
+        else:
+            anchored.append(body)
+
+    alternatives = [f"(?:{body})" for body in anchored]
+    if anywhere:
+        alternatives.append(_ANY_DIRS_PREFIX + "(?:" + "|".join(f"(?:{body})" for body in anywhere) + ")")
+    combined = "^(?:" + "|".join(alternatives) + ")"
+    use_re2 = backend == "re2" or (backend != "re" and len(regexes) > RE2_MIN_RULES)
+    if re2 is not None and use_re2:
+        try:
+            return re2.compile(combined)
+        except re2.error:
+            pass  # Syntax re2 does not support; `re` handles every pathspec regex.
+    return re.compile(combined)
+
+def _stop_scan(rule_id: int, start: int, end: int, flags: int, context: object) -> bool:
+    # The first hit decides; returning True ends the scan with ScanTerminated.
+    return True
+
+def _hyperscan_matcher(regexes: List[str]) -> Optional[Callable[[str], bool]]:
+    """
+    Compiles *regexes* into one Hyperscan block-mode database and returns a
+    `match_file` function, or None if Hyperscan is missing or rejects a rule.
+    Scratch space is per thread, since the walker matches from several threads.
+    """
+    if hyperscan is None:
+        return None
+    try:
+        db = hyperscan.Database()
+        db.compile(
+            expressions=[_NAMED_GROUP_RE.sub("(?:", r).encode("utf-8") for r in regexes],
+            ids=list(range(len(regexes))),
+            elements=len(regexes),
+            flags=[hyperscan.HS_FLAG_SINGLEMATCH | hyperscan.HS_FLAG_UTF8 | hyperscan.HS_FLAG_SOM_LEFTMOST] * len(regexes),
+        )
+    except hyperscan.error:
+        return None
+
+    local = threading.local()
+
+    def match_file(file: str) -> bool:
+        scratch = getattr(local, "scratch", None)
+        if scratch is None:
+            scratch = local.scratch = hyperscan.Scratch(db)
+        try:
+            db.scan(file.encode("utf-8"), match_event_handler=_stop_scan, scratch=scratch)
+        except hyperscan.ScanTerminated:
+            return True
+        return False
+
+    return match_file
+
+def _regex_matchers(
+    regexes: List[str],
+) -> Tuple[Callable[[str], bool], Callable[[Iterable[str]], List[str]]]:
+    """
+    Returns `(match_file, match_files)` for exclude rules given as pathspec
+    regexes: Hyperscan when FLATCODE_MATCHER=hyperscan and usable, else one
+    combined regex (see _combine_regexes).
+    """
+    backend = os.environ.get(MATCHER_ENV, "").strip().lower()
+    hs_match = _hyperscan_matcher(regexes) if backend == "hyperscan" else None
+    if hs_match is not None:
+        return hs_match, lambda files: [f for f in files if hs_match(f)]
+
+    match = _combine_regexes(regexes, backend).match
+
+    def match_file(file: str) -> bool:
+        return match(file) is not None
+
+    def match_files(files: Iterable[str]) -> List[str]:
+        return [f for f in files if match(f) is not None]
+
+    return match_file, match_files
+
+class CompiledIgnoreSpec:
+    """
+    A PathSpec whose exclude rules are combined into a single compiled regex,
+    so each path is tested with one regex match instead of one per rule.
+
+    Gitignore semantics are "last matching rule wins". That reduces to a plain
+    alternation only when there are no negated ("!") rules; otherwise matching
+    defers to the wrapped spec (a GitIgnoreSpec when built by load_ignore_spec),
+    which evaluates the rules in order with git's re-include restrictions.
+
+    The matcher is specialized once per ruleset: `match_file(path) -> bool`
+    and `match_files(paths) -> list` (PathSpec's contract) are bound at
+    construction to closures for the case at hand (combined regex, plain-name
+    sets plus a regex for the rest, ordered PathSpec, or empty), so calls
+    carry no per-path branching.
+
+    Paths must already be normalized, relative POSIX paths (as produced by the
+    scanner). Directories are tested with a trailing '/'.
+
+    `literal_dir_names` holds the bare names ("node_modules", ".git") that
+    exclude any directory so named, at any depth. Callers may prune such a
+    directory by its basename without calling match_file. It is empty when
+    the rules contain negations, since a later "!" rule could re-include it.
+    """
+
+    def __init__(self, spec: pathspec.PathSpec):
+        self.spec = spec
+        self.patterns = spec.patterns
+
+        active = [p for p in spec.patterns if p.include is not None and p.regex is not None]
+        self.has_negation = any(not p.include for p in active)
+
+        self.match_file: Callable[[str], bool]
+        self.match_files: Callable[[Iterable[str]], List[str]]
+        self.literal_dir_names: FrozenSet[str] = frozenset()
+
+        if self.has_negation:
+            self.match_file = spec.match_file
+            self.match_files = lambda files: list(spec.match_files(files))
+        elif active:
+            names: Set[str] = set()
+            dir_names: Set[str] = set()
+            other: List[str] = []
+            for p in active:
+                text = p.pattern if isinstance(p.pattern, str) else ""
+                if _LITERAL_NAME_RE.fullmatch(text):
+                    (dir_names if text.endswith("/") else names).add(text.rstrip("/"))
+                else:
+                    other.append(p.regex.pattern)
+            self.literal_dir_names = frozenset(names | dir_names)
+
+            if len(names) + len(dir_names) < LITERAL_MIN_RULES:
+                self.match_file, self.match_files = _regex_matchers([p.regex.pattern for p in active])
+            else:
+                # Many plain-name rules ("node_modules/", ".DS_Store"): set lookups
+                # on the path's segments replace their regex alternatives, whose
+                # cost grows with every rule. A name rule matches the last
+                # segment; both kinds match any parent segment, which covers
+                # everything beneath that directory.
+                other_match = _regex_matchers(other)[0] if other else None
+                last_names = frozenset(names)
+                parent_names = self.literal_dir_names
+
+                def match_file(file: str) -> bool:
+                    parts = file.split("/")
+                    if parts.pop() in last_names or not parent_names.isdisjoint(parts):
+                        return True
+                    return other_match is not None and other_match(file)
+
+                self.match_file = match_file
+                self.match_files = lambda files: [f for f in files if match_file(f)]
+        else:
+            self.match_file = lambda file: False
+            self.match_files = lambda files: []
+
+def _current_umask() -> int:
+    # os.umask can only be read by setting it; restore it straight away.
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    """
+    Writes *data* to a temp file next to *path*, then renames it into place, so
+    an interrupted run never leaves a truncated file behind. The temp file gets
+    a unique name from mkstemp (matched by TEMP_FILE_PATTERN, so a leftover
+    one is never scanned) and is chmod-ed to the usual umask-derived mode.
+    """
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=".flatcode-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.chmod(tmp_name, 0o666 & ~_current_umask())
+        os.replace(tmp_name, path)
+    except BaseException:
+        # Only our own temp file is removed; it no longer exists once replaced.
+        if os.path.exists(tmp_name):
+            os.unlink(tmp_name)
+        raise
+
+def bootstrap_mergeignore(root_dir: Path, output_filename: str, assume_yes: bool = False) -> Path:
     """
     Checks for .mergeignore.
     1. If missing, create it with defaults + output_filename.
     2. If exists, check if output_filename is ignored. If not, append it.
+    With assume_yes (or when stdin is not a terminal) the .gitignore prompt is
+    answered "yes" without blocking on input().
     """
     mergeignore_file = root_dir / ".mergeignore"
     
@@ -19,24 +301,28 @@ def bootstrap_mergeignore(root_dir: Path, output_filename: str) -> Path:
         gitignore_file = root_dir / ".gitignore"
         
         try:
-            patterns_to_write = []
+            # The .gitignore body is copied as bytes, without a splitlines/join round trip.
+            body = b""
             if gitignore_file.exists():
-                # Side-effect: input() for interactive mode
-                choice = input(f"> Found .gitignore. Copy rules to .mergeignore? (Y/n): ").strip().lower()
+                if assume_yes or not sys.stdin.isatty():
+                    choice = 'y'
+                else:
+                    # Side-effect: input() for interactive mode
+                    choice = input(f"> Found .gitignore. Copy rules to .mergeignore? (Y/n): ").strip().lower()
                 if choice != 'n':
-                    with open(gitignore_file, "r", encoding="utf-8") as f_git:
-                        patterns_to_write.extend(f_git.read().splitlines())
+                    with open(gitignore_file, "rb") as f_git:
+                        body = f_git.read().rstrip(b"\r\n")
                     print(f"Copied rules from .gitignore.")
             
-            if not patterns_to_write:
-                patterns_to_write = list(DEFAULT_IGNORE_PATTERNS) # Copy list
+            if not body:
+                body = "\n".join(DEFAULT_IGNORE_PATTERNS).encode("utf-8")
             
             # Add the output file explicitly
-            if output_filename not in patterns_to_write:
-                patterns_to_write.append(f"\n# Exclude this tool's output\n{output_filename}")
+            output_rule = output_filename.encode("utf-8")
+            if output_rule not in body.splitlines():
+                body += b"\n\n# Exclude this tool's output\n" + output_rule
 
-            with open(mergeignore_file, "w", encoding="utf-8") as f:
-                f.write("\n".join(patterns_to_write))
+            _write_atomic(mergeignore_file, body)
             
             print(f"Successfully created: {mergeignore_file.name}")
             return mergeignore_file
@@ -52,7 +338,7 @@ def bootstrap_mergeignore(root_dir: Path, output_filename: str) -> Path:
             with open(mergeignore_file, "r", encoding="utf-8") as f:
                 lines = f.readlines()
             
-            spec = pathspec.PathSpec.from_lines("gitwildmatch", lines)
+            spec = pathspec.GitIgnoreSpec.from_lines(lines)
             
             # If the output file is NOT ignored by current rules, append it.
             if not spec.match_file(output_filename):
@@ -65,23 +351,43 @@ def bootstrap_mergeignore(root_dir: Path, output_filename: str) -> Path:
         
         return mergeignore_file
 
-def load_ignore_spec(mergeignore_file: Path, extra_patterns: Optional[List[str]] = None) -> pathspec.PathSpec:
+def load_ignore_spec(mergeignore_file: Path, extra_patterns: Optional[List[str]] = None) -> CompiledIgnoreSpec:
     """
-    Loads rules from .mergeignore and creates a PathSpec object.
+    Loads rules from .mergeignore and compiles them into a CompiledIgnoreSpec.
     Includes any extra patterns (like the output filename) for runtime safety.
+    Patterns are normalized first: repeated '**/' segments and runs of '*'
+    collapse to their single equivalent, which matches the same paths.
+
+    Results are memoized per (file, mtime, size, extra patterns), so loading
+    an unchanged file again in the same process reuses the compiled spec.
     """
+    try:
+        st = mergeignore_file.stat()
+        stamp: Optional[Tuple[int, int]] = (st.st_mtime_ns, st.st_size)
+    except OSError:
+        stamp = None
+    return _load_ignore_spec_cached(str(mergeignore_file), stamp, tuple(extra_patterns or ()))
+
+@lru_cache(maxsize=32)
+def _load_ignore_spec_cached(
+    mergeignore_file: str, stamp: Optional[Tuple[int, int]], extra_patterns: Tuple[str, ...]
+) -> CompiledIgnoreSpec:
+    """Does the actual load; `stamp` is None when the file does not exist."""
     lines = []
     
-    if mergeignore_file.exists():
+    if stamp is not None:
         with open(mergeignore_file, "r", encoding="utf-8") as f:
             lines = f.readlines()
     
     if extra_patterns:
         lines.extend(extra_patterns)
+    # Always skip our own temp files, even when the rules came from .gitignore.
+    lines.append(TEMP_FILE_PATTERN)
 
     try:
-        spec = pathspec.PathSpec.from_lines("gitwildmatch", lines)
-        return spec
+        # Redundant '**' / '***' runs are collapsed first (see _normalize_pattern).
+        spec = pathspec.GitIgnoreSpec.from_lines([_normalize_pattern(line) for line in lines])
+        return CompiledIgnoreSpec(spec)
     except Exception as e:
         print(f"Error parsing ignore rules: {e}", file=sys.stderr)
-        return pathspec.PathSpec.from_lines("gitwildmatch", [])
\ No newline at end of file
+        return CompiledIgnoreSpec(pathspec.GitIgnoreSpec.from_lines([]))
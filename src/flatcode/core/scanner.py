@@ -1,91 +1,365 @@
 # src/flatcode/core/scanner.py
 import sys
+import mmap
 import os
+import queue
+import threading
 from pathlib import Path
-from typing import Iterator, Set
+from typing import Iterator, List, NamedTuple, Optional, Set, Tuple, Union
 import pathspec
 
+from flatcode.core.binary import is_binary_head
+from flatcode.core.ignore import CompiledIgnoreSpec
 from flatcode.models import FileContext
+from flatcode.utils.cache import TokenCache
+from flatcode.utils.readahead import read_ahead, warn_read_error
 from flatcode.utils.tokenizer import Tokenizer
 
+# A tokenize batch is flushed once it holds this many files or this many
+# bytes, whichever comes first: batches stay large enough to keep tiktoken's
+# thread pool busy while a few huge files can't blow up memory.
+TOKENIZE_BATCH_SIZE = 1024
+TOKENIZE_BATCH_BYTES = 32 * 1024 * 1024
+
+# Bytes read up front to decide whether a file is binary (see core.binary).
+BINARY_SNIFF_SIZE = 8192
+
+# Directory-listing threads. os.scandir releases the GIL while reading, so the
+# pool hides readdir latency even under CPython (same sizing as ThreadPoolExecutor).
+DEFAULT_WALK_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+
+# Files above this size are decoded from an mmap instead of read(); below it
+# the mapping setup costs more than the copy it saves.
+MMAP_THRESHOLD = 256 * 1024
+
+_OPEN_FLAGS = os.O_RDONLY | getattr(os, "O_BINARY", 0) | getattr(os, "O_CLOEXEC", 0)
+# Skips the atime update (and its inode writeback) on Linux; only allowed on
+# files we own, so _open_readonly falls back to plain flags on EPERM.
+_O_NOATIME = getattr(os, "O_NOATIME", 0)
+
+def _open_readonly(path: str) -> int:
+    """Opens *path* for reading as a raw fd, with O_NOATIME where permitted."""
+    if _O_NOATIME:
+        try:
+            return os.open(path, _OPEN_FLAGS | _O_NOATIME)
+        except PermissionError:
+            pass
+    return os.open(path, _OPEN_FLAGS)
+
+def _read_to_end(fd: int, head: bytes) -> bytes:
+    """Reads the rest of *fd* after *head* was already read from it."""
+    chunks = [head]
+    while True:
+        chunk = os.read(fd, 1 << 20)
+        if not chunk:
+            return b"".join(chunks)
+        chunks.append(chunk)
+
+class _LoadedFile(NamedTuple):
+    """A candidate file after reading; `content` is None when `tokens` came from the cache."""
+    abs_path: str
+    rel_path: str
+    content: Optional[str]
+    size: int
+    mtime_ns: int
+    tokens: Optional[int]
+
 class ProjectScanner:
-    def __init__(self, root_dir: Path, ignore_spec: pathspec.PathSpec, extensions: Set[str]):
+    """
+    Walks a project and yields FileContext objects for its non-ignored text files.
+
+    `ignore_spec` is normally the CompiledIgnoreSpec from load_ignore_spec; a
+    plain pathspec.PathSpec also works. Only `match_files` is required. The
+    optional `literal_dir_names` (CompiledIgnoreSpec only) lets directories be
+    pruned by name before any matching.
+    """
+
+    def __init__(
+        self,
+        root_dir: Path,
+        ignore_spec: Union[CompiledIgnoreSpec, pathspec.PathSpec],
+        extensions: Set[str],
+        walk_workers: Optional[int] = None,
+        fast_tokens: bool = False,
+        token_cache: Optional[TokenCache] = None,
+    ):
         self.root_dir = root_dir
+        # The walk works on plain strings; Path is kept to the public API.
+        self._root_str = os.fspath(root_dir)
         self.ignore_spec = ignore_spec
-        self.extensions = extensions
+        # Directory names the spec excludes outright (see CompiledIgnoreSpec);
+        # those are pruned by name before any pattern matching.
+        self.literal_dir_names = getattr(ignore_spec, "literal_dir_names", frozenset())
         self.match_all = "*" in extensions
+        # ".py"-style entries are matched against the file's last suffix; the
+        # rest ("Makefile", ".bashrc.bak") can only name a file exactly.
+        self.extensions = frozenset(e for e in extensions if e.startswith(".") and "." not in e[1:])
+        self.explicit_filenames = frozenset(e for e in extensions if e not in self.extensions)
+        self.walk_workers = max(1, walk_workers or DEFAULT_WALK_WORKERS)
+        # Estimate tokens from byte size instead of running the tokenizer. Files
+        # are still read and decoded: the decode is the UTF-8 check that keeps
+        # non-text files out of the output, so only the tokenizer pass is saved.
+        self.fast_tokens = fast_tokens
+        # Optional persistent token counts; unchanged files are then not even read.
+        # Unused with fast_tokens: estimates must not be stored (or served) as
+        # tokenizer counts under the cache's encoding.
+        self.token_cache = None if fast_tokens else token_cache
 
-    def _is_binary_file(self, path: Path) -> bool:
+    def _tokenize_batch(self, pending: List[_LoadedFile]) -> Iterator[FileContext]:
         """
-        Reads the first 1024 bytes to check for null bytes.
-        Returns True if likely binary, False if likely text.
+        Counts tokens for a batch of loaded files in one tokenizer call, skipping
+        files whose count came from the cache. The content strings are dropped
+        once counted.
         """
-        try:
-            with path.open("rb") as f:
-                chunk = f.read(1024)
-                return b'\0' in chunk
-        except Exception:
-            return True
+        todo = [f for f in pending if f.tokens is None]
+        if self.fast_tokens:
+            counts = [Tokenizer.estimate(f.size) for f in todo]
+        else:
+            counts = Tokenizer.count_batch([f.content for f in todo])
+        computed = {f.abs_path: tokens for f, tokens in zip(todo, counts)}
 
-    def scan(self) -> Iterator[FileContext]:
+        for f in pending:
+            tokens = f.tokens
+            if tokens is None:
+                tokens = computed[f.abs_path]
+                if self.token_cache is not None:
+                    self.token_cache.put(f.rel_path, f.mtime_ns, f.size, tokens)
+            yield FileContext(
+                abs_path=f.abs_path,
+                rel_path=f.rel_path,
+                token_count=tokens,
+                size=f.size
+            )
+
+    def _scan_dir(self, dir_path: str, root_len: int) -> Tuple[List[str], List[Tuple[str, str]]]:
         """
-        Walks the directory tree, pruning ignored directories efficiently,
-        and yields FileContext objects for valid text files.
+        Lists one directory. Returns (subdirs to descend into, candidate files)
+        where candidates are (abs_path, rel_path) pairs that passed the ignore
+        and extension checks.
+
+        Ignore rules are applied once per directory through the spec's batch
+        `match_files` API, rather than one `match_file` call per entry.
         """
-        for root, dirs, files in os.walk(self.root_dir):
-            root_path = Path(root)
-            
-            # --- 1. Prune Directories ---
-            # Remove ignored directories from 'dirs' to prevent descending into them.
-            # Iterating backwards or over a copy to allow safe removal.
-            for d in list(dirs):
-                dir_abs_path = root_path / d
-                try:
-                    dir_rel_path = dir_abs_path.relative_to(self.root_dir)
-                except ValueError:
-                    continue
-
-                # IMPORTANT: We append '/' to tell pathspec this is a directory.
-                # Git rules like "node_modules/" match directories specifically.
-                check_path = dir_rel_path.as_posix() + "/"
-                
-                if self.ignore_spec.match_file(check_path):
-                    dirs.remove(d)
-
-            # --- 2. Process Files ---
-            for f in files:
-                file_abs_path = root_path / f
-                try:
-                    rel_path = file_abs_path.relative_to(self.root_dir)
-                except ValueError:
-                    continue
-                
-                rel_path_str = rel_path.as_posix()
-
-                # A. Ignore Check (PathSpec)
-                if self.ignore_spec.match_file(rel_path_str):
-                    continue
-
-                # B. Extension Check
-                if not self.match_all:
-                    # Using path suffix check
-                    if not (file_abs_path.suffix in self.extensions or file_abs_path.name in self.extensions):
+        dir_candidates: List[Tuple[str, str]] = []
+        file_candidates: List[Tuple[str, str]] = []
+
+        # Hoist everything the per-entry loop touches into locals: each global
+        # or attribute lookup is paid once per directory instead of per entry.
+        match_all = self.match_all
+        extensions = self.extensions
+        explicit_filenames = self.explicit_filenames
+        literal_dir_names = self.literal_dir_names
+        dirs_append = dir_candidates.append
+        files_append = file_candidates.append
+        fix_sep = os.sep != "/"
+        sep = os.sep
+
+        # DirEntry objects are consumed straight from the scandir iterator; the
+        # listing is never materialized and no Path is built per entry.
+        try:
+            with os.scandir(dir_path) as it:
+                for entry in it:
+                    entry_path = entry.path
+                    rel_path_str = entry_path[root_len:]
+                    if fix_sep:
+                        rel_path_str = rel_path_str.replace(sep, "/")
+
+                    # --- 1. Directories ---
+                    # DirEntry.is_dir() reuses the d_type from readdir, so no extra stat.
+                    # Symlinked directories are not followed (same as os.walk's default).
+                    if entry.is_dir(follow_symlinks=False):
+                        # Excluded by a plain-name rule: drop it without matching.
+                        if entry.name in literal_dir_names:
+                            continue
+                        # IMPORTANT: We append '/' to tell pathspec this is a directory.
+                        # Git rules like "node_modules/" match directories specifically.
+                        dirs_append((entry_path, rel_path_str + "/"))
                         continue
 
-                # C. Binary Check
-                if self._is_binary_file(file_abs_path):
-                    continue
+                    # --- 2. Files ---
+                    if not entry.is_file():
+                        continue
+
+                    # Extension Check
+                    # An O(1) set lookup, so it runs before the (costlier) ignore match.
+                    if not match_all:
+                        # Plain string ops on the name; no Path is built per entry.
+                        name = entry.name
+                        if name not in explicit_filenames:
+                            dot = name.rfind(".")
+                            if dot < 0 or name[dot:] not in extensions:
+                                continue
+
+                    files_append((entry_path, rel_path_str))
+        except OSError as e:
+            print(f"  > [Warning] Skipping directory {dir_path} ({e})", file=sys.stderr)
+            return [], []
+
+        # --- 3. Ignore Check (PathSpec), batched ---
+        # Ignored directories are pruned here: they are never queued for listing.
+        match_files = self.ignore_spec.match_files
+        subdirs: List[str] = []
+        if dir_candidates:
+            ignored = set(match_files([rel for _, rel in dir_candidates]))
+            subdirs = [path for path, rel in dir_candidates if rel not in ignored]
+
+        files: List[Tuple[str, str]] = file_candidates
+        if file_candidates:
+            ignored = set(match_files([rel for _, rel in file_candidates]))
+            if ignored:
+                files = [item for item in file_candidates if item[1] not in ignored]
+
+        return subdirs, files
 
+    def _walk(self) -> List[Tuple[str, str]]:
+        """
+        Parallel depth-first traversal: each task is one directory, pulled from a
+        shared queue by `walk_workers` threads that enqueue the subdirectories
+        they find. A counter of outstanding directories tells the workers when
+        the walk is complete. Returns candidate files sorted by rel_path
+        components, the order the project tree is rendered in (see core.tree),
+        so the result does not depend on thread scheduling.
+        """
+        # Every entry.path starts with root_prefix, so slicing gives the rel path.
+        root_prefix = os.path.join(self._root_str, "")
+        root_len = len(root_prefix)
+
+        dirs: "queue.SimpleQueue[Optional[str]]" = queue.SimpleQueue()
+        results: List[Tuple[str, str]] = []
+        errors: List[BaseException] = []
+        lock = threading.Lock()
+        outstanding = 1
+        dirs.put(root_prefix)
+
+        def worker() -> None:
+            nonlocal outstanding
+            while True:
+                dir_path = dirs.get()
+                if dir_path is None:
+                    return
                 try:
-                    content = file_abs_path.read_text(encoding="utf-8")
-                    tokens = Tokenizer.count(content)
-                    yield FileContext(
-                        path=file_abs_path,
-                        rel_path=rel_path_str,
-                        content=content,
-                        token_count=tokens
-                    )
-                except UnicodeDecodeError:
-                    continue
-                except Exception as e:
-                    print(f"  > [Warning] Skipping {rel_path_str} (read error: {e})", file=sys.stderr)
\ No newline at end of file
+                    subdirs, files = self._scan_dir(dir_path, root_len)
+                    results.extend(files)
+                    # Count children before queueing them, so the counter can't
+                    # hit zero while this directory's subtree is still pending.
+                    with lock:
+                        outstanding += len(subdirs)
+                    for d in subdirs:
+                        dirs.put(d)
+                except BaseException as e:
+                    errors.append(e)
+                finally:
+                    with lock:
+                        outstanding -= 1
+                        finished = outstanding == 0 or bool(errors)
+                    if finished:
+                        for _ in range(self.walk_workers):
+                            dirs.put(None)
+
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(self.walk_workers)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        if errors:
+            raise errors[0]
+
+        # Compare per component: as flat strings "a-c.py" and "a.b" would sort
+        # before "a/x.py", since '-' and '.' are below '/'.
+        results.sort(key=lambda item: item[1].split("/"))
+        return results
+
+    @staticmethod
+    def _decode_mapped(fd: int, head: bytes) -> Tuple[str, int]:
+        """
+        Decodes a large file straight from a read-only mmap. str() accepts the
+        mapping as a buffer, so the bytes are never copied into an intermediate
+        bytes object. Returns (content, size_in_bytes).
+        """
+        try:
+            with mmap.mmap(fd, 0, access=mmap.ACCESS_READ) as mm:
+                return str(mm, "utf-8"), len(mm)
+        except (OSError, ValueError):
+            # Not mappable (e.g. special files): plain read.
+            data = _read_to_end(fd, head)
+            return data.decode("utf-8"), len(data)
+
+    def _load_file(self, abs_path: str, rel_path: str) -> Optional[_LoadedFile]:
+        """
+        Reads and decodes one candidate file, or returns its cached token count
+        without reading when size and mtime are unchanged.
+        Returns None for binary, non-UTF-8 or unreadable files. Every file is
+        decoded, with or without fast_tokens: decoding is the UTF-8 check.
+
+        Reads go through raw os.open/os.read: no TextIOWrapper/BufferedReader
+        objects per file, and a small file costs exactly open + read + close.
+        """
+        try:
+            mtime_ns = 0
+            if self.token_cache is not None:
+                st = os.stat(abs_path)
+                mtime_ns = st.st_mtime_ns
+                tokens = self.token_cache.get(rel_path, mtime_ns, st.st_size)
+                if tokens is not None:
+                    return _LoadedFile(abs_path, rel_path, None, st.st_size, mtime_ns, tokens)
+
+            # Binary Check + Read (single open)
+            # Binary files are rejected from the first chunk without reading the rest.
+            fd = _open_readonly(abs_path)
+            try:
+                head = os.read(fd, BINARY_SNIFF_SIZE)
+                if is_binary_head(head):
+                    return None
+                if len(head) < BINARY_SNIFF_SIZE:
+                    # A short read of a regular file means EOF: head is the whole file.
+                    data = head
+                elif os.fstat(fd).st_size > MMAP_THRESHOLD:
+                    content, size = self._decode_mapped(fd, head)
+                    return _LoadedFile(abs_path, rel_path, content, size, mtime_ns, None)
+                else:
+                    data = _read_to_end(fd, head)
+            finally:
+                os.close(fd)
+            return _LoadedFile(abs_path, rel_path, data.decode("utf-8"), len(data), mtime_ns, None)
+        except UnicodeDecodeError:
+            return None
+        except Exception as e:
+            warn_read_error(rel_path, e)
+            return None
+
+    def _iter_loaded(self, candidates: List[Tuple[str, str]]) -> Iterator[Optional[_LoadedFile]]:
+        """Loads candidates in order, through the shared reader pool (see utils.readahead)."""
+        return read_ahead(lambda item: self._load_file(*item), candidates)
+
+    def scan(self) -> Iterator[FileContext]:
+        """
+        Walks the directory tree (see _walk), pruning ignored directories before
+        descending into them, and yields FileContext objects for valid text files.
+
+        Reading and tokenizing are pipelined: reads keep running in the reader
+        pool (see _iter_loaded) while the current batch is being tokenized
+        (tiktoken releases the GIL), so disk and CPU overlap. Results keep the
+        walk order and memory stays bounded by READ_AHEAD reads (see
+        utils.readahead) plus one batch.
+        """
+        # Files are read ahead but tokenized in batches (see TOKENIZE_BATCH_SIZE).
+        pending: List[_LoadedFile] = []
+        pending_bytes = 0
+
+        for loaded in self._iter_loaded(self._walk()):
+            if loaded is None:
+                continue
+            pending.append(loaded)
+            if loaded.content is not None:
+                pending_bytes += loaded.size
+            if len(pending) >= TOKENIZE_BATCH_SIZE or pending_bytes >= TOKENIZE_BATCH_BYTES:
+                yield from self._tokenize_batch(pending)
+                pending = []
+                pending_bytes = 0
+
+        if pending:
+            yield from self._tokenize_batch(pending)
+
+        if self.token_cache is not None:
+            self.token_cache.save()
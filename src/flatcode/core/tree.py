@@ -1,30 +1,54 @@
 # src/flatcode/core/tree.py
-from typing import List, Dict
-from pathlib import Path
+from typing import List
 
 def generate_project_tree(file_paths: List[str], root_name: str) -> str:
-    """Generates a string representation of the project tree."""
-    tree_dict: Dict = {}
-    for path in sorted(file_paths):
-        parts = Path(path).parts
-        current_level = tree_dict
-        for part in parts:
-            if part not in current_level:
-                current_level[part] = {}
-            current_level = current_level[part]
+    """
+    Generates a string representation of the project tree.
 
-    lines = [f"{root_name}/"]
+    Paths are sorted once by their components and the tree is emitted in a
+    linear pass by comparing each path with its neighbours, so no nested dict
+    is built and nothing recurses.
+
+    `file_paths` are the scanner's rel paths, which always use "/" as the
+    separator, so they are split directly instead of going through pathlib.
+    """
+    paths: List[List[str]] = sorted(path.split("/") for path in file_paths)
+    n = len(paths)
+
+    # lcp[i]: number of leading parts paths[i] shares with paths[i - 1].
+    lcp = [0] * n
+    for i in range(1, n):
+        prev, cur = paths[i - 1], paths[i]
+        k, limit = 0, min(len(prev), len(cur))
+        while k < limit and prev[k] == cur[k]:
+            k += 1
+        lcp[i] = k
 
-    def _generate_lines_recursive(subtree: Dict, prefix: str):
-        entries = sorted(subtree.items())
-        for i, (name, content) in enumerate(entries):
-            is_last = (i == len(entries) - 1)
-            connector = "└── " if is_last else "├── "
-            lines.append(f"{prefix}{connector}{name}")
-            
-            if content:
-                new_prefix = prefix + ("    " if is_last else "│   ")
-                _generate_lines_recursive(content, new_prefix)
+    # Backward pass: new_last[i][k] tells whether the k-th node introduced by
+    # paths[i] (depth lcp[i] + k) is the last child of its parent. A node's fate
+    # is decided by the first path after its subtree: only a path diverging
+    # exactly at the node's depth shares its parent. `current` carries the
+    # flags of the nodes still open on the way up, so nothing is copied.
+    new_last: List[List[bool]] = [[] for _ in range(n)]
+    current: List[bool] = []
+    for i in range(n - 1, -1, -1):
+        depth = len(paths[i])
+        boundary = lcp[i + 1] if i + 1 < n else -1
+        del current[depth:]
+        current.extend([True] * (depth - len(current)))
+        for d in range(max(boundary, 0), depth):
+            current[d] = d != boundary
+        new_last[i] = current[lcp[i]:depth]
+
+    lines = [f"{root_name}/"]
+    # prefixes[d]: indentation for nodes at depth d, shared while ancestors are.
+    prefixes = [""]
+    for i, parts in enumerate(paths):
+        start = lcp[i]
+        del prefixes[start + 1:]
+        for d, last in enumerate(new_last[i], start):
+            connector = "└── " if last else "├── "
+            lines.append(f"{prefixes[d]}{connector}{parts[d]}")
+            prefixes.append(prefixes[d] + ("    " if last else "│   "))
 
-    _generate_lines_recursive(tree_dict, "")
     return "\n".join(lines) + "\n"
@@ -0,0 +1,134 @@
+# src/flatcode/core/writer.py
+import os
+import shutil
+import sys
+from pathlib import Path
+from typing import BinaryIO, Iterator, List, Tuple, Union
+
+from flatcode.core.scanner import MMAP_THRESHOLD
+from flatcode.models import FileContext
+from flatcode.utils.readahead import read_ahead, warn_read_error
+
+# Static separators, encoded once at import. Per-file blocks are assembled
+# from these with bytes formatting and written to a binary buffered file.
+_CONTEXT_BANNER = b"# --- flatcode Context ---\n"
+_TREE_BANNER = b"# --- Project Tree ---\n"
+_CONTEXT_START = b"# --- Context Start ---\n\n"
+_FILE_HEADER = b"--- File: %s ---\n\n"
+_FILE_FOOTER = b"\n\n--- End: %s ---\n\n"
+
+# Output buffer size. Headers, footers and small files are coalesced into
+# ~1 MiB writes instead of one syscall per 8 KiB default buffer; larger
+# files go through in a single write.
+WRITE_BUFFER_SIZE = 1 << 20
+
+# Files at least this large are not read into Python: they are copied from
+# their fd into the output's fd by the kernel (os.sendfile). Smaller files stay
+# on the buffered path, where one coalesced write beats a syscall per file.
+SENDFILE_MIN_SIZE = MMAP_THRESHOLD
+
+# Only Linux accepts a regular file as sendfile's destination (macOS and the
+# BSDs require a socket); elsewhere large files go through shutil.copyfileobj.
+_HAS_FILE_SENDFILE = hasattr(os, "sendfile") and sys.platform.startswith("linux")
+
+class _Stream:
+    """Marker for a file that is copied fd-to-fd at write time instead of being read ahead."""
+
+_STREAM = _Stream()
+
+def _read_or_warn(fc: FileContext) -> Union[bytes, _Stream, None]:
+    """Reads one file for output; a file that vanished or became unreadable is skipped."""
+    if fc.size >= SENDFILE_MIN_SIZE:
+        return _STREAM
+    try:
+        return fc.read()
+    except OSError as e:
+        warn_read_error(fc.rel_path, e)
+        return None
+
+def _iter_contents(files: List[FileContext]) -> Iterator[Tuple[FileContext, Union[bytes, _Stream, None]]]:
+    """
+    Reads files in order through the shared reader pool (see utils.readahead),
+    the same one the scanner uses. Files of SENDFILE_MIN_SIZE or more come
+    back as _STREAM and are left for _copy_file.
+    """
+    return zip(files, read_ahead(_read_or_warn, files))
+
+def _copy_file(src: BinaryIO, out: BinaryIO) -> None:
+    """
+    Appends all of *src* to *out*. With sendfile the bytes move between the
+    two fds inside the kernel; *out* must have been flushed first. Falls back
+    to a buffered copy (resuming where sendfile stopped) if it is unavailable
+    or refused for this pair of files.
+    """
+    offset = 0
+    if _HAS_FILE_SENDFILE:
+        in_fd, out_fd = src.fileno(), out.fileno()
+        size = os.fstat(in_fd).st_size
+        try:
+            while offset < size:
+                sent = os.sendfile(out_fd, in_fd, offset, size - offset)
+                if not sent:
+                    break
+                offset += sent
+            return
+        except OSError:
+            pass
+    src.seek(offset)
+    shutil.copyfileobj(src, out, WRITE_BUFFER_SIZE)
+
+def _counts_line(files: int, tokens: int, files_width: int, tokens_width: int) -> bytes:
+    # Padded to fixed widths so the final counts can overwrite the placeholder in place.
+    return f"# Files: {files:<{files_width}} | Tokens: {tokens:<{tokens_width}}\n".encode("utf-8")
+
+def write_context(output_file: Path, files: List[FileContext], tree_str: str, total_tokens: int) -> Tuple[int, int]:
+    """
+    Writes the flattened context file: a header with totals and the project
+    tree, followed by every file's content between File/End markers.
+    File contents are copied as raw bytes (already validated as UTF-8 by the
+    scanner), so nothing is decoded and re-encoded on the way out.
+
+    Files that vanished or became unreadable since the scan are skipped. The
+    header's counts are patched afterwards to cover only the files actually
+    written, and those (files, tokens) totals are returned.
+    """
+    files_width = len(str(len(files)))
+    tokens_width = len(str(total_tokens))
+    header = b"".join((
+        _CONTEXT_BANNER,
+        _counts_line(len(files), total_tokens, files_width, tokens_width),
+        _TREE_BANNER,
+        tree_str.encode("utf-8"),
+        _CONTEXT_START,
+    ))
+    written_files = 0
+    written_tokens = 0
+    with open(output_file, "wb", buffering=WRITE_BUFFER_SIZE) as f:
+        f.write(header)
+        # Contents are re-read here instead of being held since the scan.
+        for fc, data in _iter_contents(files):
+            if data is None:
+                continue
+            rel = fc.rel_path.encode("utf-8")
+            if data is _STREAM:
+                try:
+                    src = open(fc.abs_path, "rb")
+                except OSError as e:
+                    warn_read_error(fc.rel_path, e)
+                    continue
+                with src:
+                    f.write(_FILE_HEADER % rel)
+                    f.flush()
+                    _copy_file(src, f)
+            else:
+                f.write(_FILE_HEADER % rel)
+                f.write(data)
+            f.write(_FILE_FOOTER % rel)
+            written_files += 1
+            written_tokens += fc.token_count
+
+        if written_files != len(files):
+            # Never wider than the placeholder: both counts only shrink.
+            f.seek(len(_CONTEXT_BANNER))
+            f.write(_counts_line(written_files, written_tokens, files_width, tokens_width))
+    return written_files, written_tokens
@@ -4,8 +4,35 @@ from pathlib import Path
 
 @dataclass(frozen=True)
 class FileContext:
-    """Immutable data class holding file information."""
-    path: Path
+    """
+    Immutable data class holding file information.
+    Content is not kept in memory; it is re-read from `abs_path` when written out.
+    Declares __slots__ (dataclass(slots=True) needs Python 3.10), so the
+    scanner's many instances carry no per-instance __dict__.
+    The absolute path is stored as a plain string; `path` builds a Path on demand.
+    """
+    __slots__ = ("abs_path", "rel_path", "token_count", "size")
+
+    abs_path: str
     rel_path: str
-    content: str
     token_count: int
+    size: int
+
+    # A frozen class with __slots__ has no __dict__ for pickle/copy to restore,
+    # and its __setattr__ refuses assignment: store state explicitly, the same
+    # way dataclass(slots=True) does.
+    def __getstate__(self) -> tuple:
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state: tuple) -> None:
+        for name, value in zip(self.__slots__, state):
+            object.__setattr__(self, name, value)
+
+    @property
+    def path(self) -> Path:
+        return Path(self.abs_path)
+
+    def read(self) -> bytes:
+        """Reads the file's raw bytes from disk, for streaming it to the output."""
+        with open(self.abs_path, "rb") as f:
+            return f.read()
@@ -0,0 +1,102 @@
+# src/flatcode/utils/cache.py
+import hashlib
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+# Bump when the on-disk layout changes; older files are then ignored.
+CACHE_VERSION = 1
+
+def default_cache_dir() -> Path:
+    """Per-user cache directory ($XDG_CACHE_HOME/flatcode, else ~/.cache/flatcode)."""
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return Path(base) / "flatcode"
+
+def _is_entry(entry: object) -> bool:
+    """True for a well-formed [mtime_ns, size, tokens] cache entry."""
+    return (
+        isinstance(entry, list)
+        and len(entry) == 3
+        and all(isinstance(v, int) and not isinstance(v, bool) for v in entry)
+    )
+
+class TokenCache:
+    """
+    Persists token counts between runs so unchanged files are not re-tokenized.
+    Entries are keyed by (rel_path, st_mtime_ns, st_size) and stored as one
+    JSON file per project root. A cache written with a different encoding is
+    discarded, since its counts would not be comparable.
+    """
+
+    def __init__(self, root_dir: Path, encoding_name: str, cache_dir: Optional[Path] = None):
+        self.root_dir = root_dir
+        self.encoding_name = encoding_name
+        digest = hashlib.sha1(os.fspath(root_dir).encode("utf-8")).hexdigest()[:16]
+        self.cache_file = (cache_dir or default_cache_dir()) / f"tokens-{digest}.json"
+
+        # rel_path -> [mtime_ns, size, tokens]
+        self._entries: Dict[str, List[int]] = {}
+        self._seen: Set[str] = set()
+        self._dirty = False
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self.cache_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        # A file of the wrong shape is discarded like a missing one: it must
+        # not abort the run or break lookups in the reader threads.
+        if not isinstance(data, dict):
+            return
+        if data.get("version") != CACHE_VERSION or data.get("encoding") != self.encoding_name:
+            return
+        entries = data.get("entries", {})
+        if isinstance(entries, dict) and all(_is_entry(e) for e in entries.values()):
+            self._entries = entries
+
+    def get(self, rel_path: str, mtime_ns: int, size: int) -> Optional[int]:
+        """Returns the cached token count, or None if missing or stale."""
+        entry = self._entries.get(rel_path)
+        if entry is None or entry[0] != mtime_ns or entry[1] != size:
+            return None
+        self._seen.add(rel_path)
+        return entry[2]
+
+    def put(self, rel_path: str, mtime_ns: int, size: int, tokens: int) -> None:
+        self._entries[rel_path] = [mtime_ns, size, tokens]
+        self._seen.add(rel_path)
+        self._dirty = True
+
+    def save(self) -> None:
+        """
+        Writes the cache atomically, dropping entries for files that no longer
+        exist. Failures only warn: the cache is an optimization.
+        """
+        stale = [
+            rel for rel in self._entries
+            if rel not in self._seen and not (self.root_dir / rel).exists()
+        ]
+        for rel in stale:
+            del self._entries[rel]
+        if not (self._dirty or stale):
+            return
+
+        data = {"version": CACHE_VERSION, "encoding": self.encoding_name, "entries": self._entries}
+        try:
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_file.parent, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(data, f, separators=(",", ":"))
+                os.replace(tmp_path, self.cache_file)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+            self._dirty = False
+        except OSError as e:
+            print(f"  > [Warning] Could not write token cache: {e}", file=sys.stderr)
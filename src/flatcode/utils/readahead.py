@@ -0,0 +1,42 @@
+# src/flatcode/utils/readahead.py
+import os
+import sys
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Deque, Iterator, Sequence, TypeVar
+
+# Reader threads and the number of file reads allowed in flight ahead of the
+# consumer. Bounds memory while letting reads overlap with the caller's work.
+# Reads block in the kernel with the GIL released, so the pool can exceed the
+# core count. Below PARALLEL_READ_MIN_FILES items, files are read inline.
+READ_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+READ_AHEAD = 64
+PARALLEL_READ_MIN_FILES = 32
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+def read_ahead(func: Callable[[T], R], items: Sequence[T]) -> Iterator[R]:
+    """
+    Yields func(item) for each of *items*, in order. Large sets go through a
+    pool of READ_WORKERS threads that keeps up to READ_AHEAD calls in flight;
+    small ones run inline, where starting threads would cost more than it saves.
+    *func* is expected to handle its own read errors (see warn_read_error).
+    """
+    if len(items) < PARALLEL_READ_MIN_FILES:
+        for item in items:
+            yield func(item)
+        return
+
+    in_flight: Deque["Future[R]"] = deque()
+    with ThreadPoolExecutor(max_workers=READ_WORKERS) as executor:
+        for item in items:
+            in_flight.append(executor.submit(func, item))
+            if len(in_flight) >= READ_AHEAD:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+
+def warn_read_error(rel_path: str, error: BaseException) -> None:
+    """Reports a file that is skipped because it could not be read."""
+    print(f"  > [Warning] Skipping {rel_path} (read error: {error})", file=sys.stderr)
@@ -1,5 +1,7 @@
 # src/flatcode/utils/tokenizer.py
+import os
 import sys
+from typing import List, Optional
 from functools import lru_cache
 
 try:
@@ -8,27 +10,73 @@ except ImportError:
     # 这里的错误处理通常在 CLI 层做，但在 Utils 层若缺失可抛出 ImportError
     tiktoken = None
 
-class Tokenizer:
-    _encoding = None
+@lru_cache(maxsize=None)
+def _load_encoding():
+    """
+    Loads the tiktoken encoding once per process. A failure is cached too
+    (as None), so an offline run without cached BPE files does not retry the
+    download for every count.
+    """
+    if tiktoken is None:
+        return None
+    for name in ("cl100k_base", "p50k_base"):
+        try:
+            return tiktoken.get_encoding(name)
+        except Exception:
+            continue
+    return None
 
-    @classmethod
-    def get_encoding(cls):
-        if cls._encoding is None:
+class Tokenizer:
+    @staticmethod
+    def get_encoding():
+        encoding = _load_encoding()
+        if encoding is None:
             if tiktoken is None:
                 raise ImportError("tiktoken not installed")
-            try:
-                cls._encoding = tiktoken.get_encoding("cl100k_base")
-            except Exception:
-                # Fallback
-                cls._encoding = tiktoken.get_encoding("p50k_base")
-        return cls._encoding
+            raise RuntimeError("no tiktoken encoding could be loaded")
+        return encoding
 
     @staticmethod
-    def count(text: str) -> int:
-        """Estimates token count for a given text."""
-        try:
-            encoding = Tokenizer.get_encoding()
-            return len(encoding.encode(text))
-        except Exception:
+    def encoding_name() -> Optional[str]:
+        """Name of the tiktoken encoding in use, or None if only the fallback estimate is available."""
+        encoding = _load_encoding()
+        return encoding.name if encoding is not None else None
+
+    @staticmethod
+    def count(text: str, exact: bool = True) -> int:
+        """
+        Estimates token count for a given text.
+        Uses encode_ordinary, like count_batch: source files may legitimately
+        contain strings such as "<|endoftext|>", which encode() would reject.
+        With exact=False the tokenizer is skipped and estimate() is used instead.
+        """
+        if not exact:
+            return Tokenizer.estimate(len(text.encode("utf-8")))
+        encoding = _load_encoding()
+        if encoding is None:
             # Fallback estimation strategy
             return len(text) // 4
+        return len(encoding.encode_ordinary(text))
+
+    @staticmethod
+    def estimate(num_bytes: int) -> int:
+        """
+        Approximates a token count from UTF-8 byte length (~4 bytes per token
+        for cl100k-family tokenizers). No tokenizer work is done.
+        Non-empty input counts as at least one token.
+        """
+        return max(1, num_bytes // 4) if num_bytes else 0
+
+    @staticmethod
+    def count_batch(texts: List[str]) -> List[int]:
+        """
+        Estimates token counts for many texts in one call.
+        tiktoken fans the batch out over its own Rust thread pool with the GIL
+        released, which is much faster than calling count() per file.
+        """
+        encoding = _load_encoding()
+        if encoding is None:
+            # Fallback estimation strategy
+            return [len(text) // 4 for text in texts]
+        encode_batch = encoding.encode_ordinary_batch
+        return list(map(len, encode_batch(texts, num_threads=os.cpu_count() or 1)))
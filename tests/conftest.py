@@ -0,0 +1,21 @@
+# tests/conftest.py
+
+import os
+from pathlib import Path
+
+import pytest
+
+def _mkfile(path: Path, data: bytes) -> Path:
+    """Creates *path* (and its parent directories) holding *data*, via raw os.open/os.write."""
+    os.makedirs(path.parent, exist_ok=True)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        os.write(fd, data)
+    finally:
+        os.close(fd)
+    return path
+
+@pytest.fixture
+def mkfile():
+    """[New] 批量创建测试文件的辅助函数：直接写入 bytes，自动创建父目录"""
+    return _mkfile
@@ -1,5 +1,6 @@
 # tests/test_refactored.py
 
+import os
 import sys
 import pytest
 from pathlib import Path
@@ -12,22 +13,28 @@ from flatcode.core.scanner import ProjectScanner
 # [Change] load_ignore_rules -> load_ignore_spec, is_path_ignored is removed
 from flatcode.core.ignore import load_ignore_spec
 from flatcode.core.tree import generate_project_tree
+from flatcode.core import writer
 from flatcode.cli import main
 from unittest.mock import patch
 
 # --- Fixtures ---
 
+@pytest.fixture(autouse=True)
+def isolated_cache_dir(tmp_path_factory, monkeypatch):
+    """[New] 将用户缓存目录重定向到临时目录，避免测试写入 ~/.cache"""
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path_factory.mktemp("xdg_cache")))
+
+# [Modify] 文件内容预先编码为 bytes，通过 mkfile 一次写入
+COMPLEX_PROJECT_FILES = {
+    "src/main.py": b"print('hello')",
+    "logs/app.log": b"error",
+    ".mergeignore": b"logs/\n",
+}
+
 @pytest.fixture
-def complex_project(tmp_path):
-    src = tmp_path / "src"
-    src.mkdir()
-    (src / "main.py").write_text("print('hello')", encoding="utf-8")
-    
-    logs = tmp_path / "logs"
-    logs.mkdir()
-    (logs / "app.log").write_text("error", encoding="utf-8")
-    
-    (tmp_path / ".mergeignore").write_text("logs/\n", encoding="utf-8")
+def complex_project(tmp_path, mkfile):
+    for rel_path, data in COMPLEX_PROJECT_FILES.items():
+        mkfile(tmp_path / rel_path, data)
     
     return tmp_path
 
@@ -55,11 +62,107 @@ def test_ignore_spec_extra_patterns(tmp_path):
     
     assert spec.match_file("output.txt") is True
 
+@pytest.mark.parametrize("literal_min_rules", [1, 10**6])
+def test_compiled_spec_matches_pathspec(tmp_path, monkeypatch, literal_min_rules):
+    """
+    [New] 验证合并后的单一正则与 PathSpec 的匹配结果一致（含 ! 取反规则的回退）
+    [Modify] 同时覆盖纯名称规则走集合查找的路径（literal_min_rules=1）
+    [Modify] 覆盖 pathspec 生成的无 ^ 锚定正则（*/、**/ 编译为 (?P<ps_d>/)）
+    """
+    from flatcode.core import ignore
+    monkeypatch.setattr(ignore, "LITERAL_MIN_RULES", literal_min_rules)
+
+    paths = ["node_modules/", "src/node_modules/", "app.log", "logs/keep.log",
+             "src/main.py", "build/", "src/build", "docs/readme.md",
+             "node_modules", "a/.DS_Store", ".DS_Store/x", "src/node_modules/pkg/index.js"]
+
+    for rules in (["node_modules/", "*.log", "/build"], ["*.log", "!keep.log", "/build"],
+                  ["node_modules/", ".DS_Store", "docs"], ["*/", "*.log"],
+                  ["**/", ".DS_Store"], ["**/*/", "/build"]):
+        ignore_file = tmp_path / ".mergeignore"
+        ignore_file.write_text("\n".join(rules), encoding="utf-8")
+
+        spec = load_ignore_spec(ignore_file)
+        reference = pathspec.GitIgnoreSpec.from_lines(rules)
+
+        for p in paths:
+            assert spec.match_file(p) is reference.match_file(p), p
+        assert spec.match_files(paths) == list(reference.match_files(paths))
+
+@pytest.mark.parametrize("libs_missing", [False, True])
+@pytest.mark.parametrize("backend", ["", "re", "re2", "hyperscan", "bogus"])
+def test_matcher_backends_match_pathspec(tmp_path, monkeypatch, backend, libs_missing):
+    """
+    [New] 验证 FLATCODE_MATCHER 各取值（含 re2 / hyperscan 未安装时的回退）
+    与 GitIgnoreSpec 的匹配结果一致；规则数超过 RE2_MIN_RULES 以覆盖自动选择 re2 的分支。
+    """
+    import re
+    from flatcode.core import ignore
+    monkeypatch.setenv(ignore.MATCHER_ENV, backend)
+    if libs_missing:
+        monkeypatch.setattr(ignore, "re2", None)
+        monkeypatch.setattr(ignore, "hyperscan", None)
+    ignore._load_ignore_spec_cached.cache_clear()
+
+    rules = ["*.log", "node_modules/", "/build", "docs/**/*.tmp", "*/", "**/gen/*.py",
+             "a/**/b", "*.py[cod]", ".DS_Store", "dist/", "/out.txt", "*.min.js",
+             "vendor/**", "tmp?", "**/cache/", "x/*/y", "coverage", "*.swp"]
+    assert len(rules) > ignore.RE2_MIN_RULES
+    paths = ["app.log", "src/app.log", "node_modules/", "pkg/node_modules/", "build/",
+             "src/build/", "docs/a/b.tmp", "docs/b.tmp", "main.py", "src/main.py",
+             "src/gen/x.py", "a/b", "a/c/d/b", "m.pyc", ".DS_Store", "dist/", "out.txt",
+             "web/app.min.js", "vendor/x/y.go", "tmp1", "tmp12", "n/cache/", "x/1/y",
+             "coverage", "f.swp", "README.md"]
+
+    ignore_file = tmp_path / ".mergeignore"
+    ignore_file.write_text("\n".join(rules), encoding="utf-8")
+    spec = load_ignore_spec(ignore_file)
+    reference = pathspec.GitIgnoreSpec.from_lines(rules)
+
+    for p in paths:
+        assert spec.match_file(p) is reference.match_file(p), p
+    assert spec.match_files(paths) == list(reference.match_files(paths))
+
+    if backend == "re" or libs_missing:
+        # 明确要求 re，或 re2 不可用时，合并正则由标准库 re 编译
+        regexes = [p.regex.pattern for p in reference.patterns if p.include is not None]
+        assert isinstance(ignore._combine_regexes(regexes, backend), re.Pattern)
+
+def test_ignore_pattern_normalization(tmp_path):
+    """[New] 验证冗余的 ** / *** 会被折叠，且匹配语义不变"""
+    from flatcode.core.ignore import _normalize_pattern
+
+    assert _normalize_pattern("**/**/**/*.log") == "**/*.log"
+    assert _normalize_pattern("src/**/**/gen/***.py\n") == "src/**/gen/*.py"
+    assert _normalize_pattern("!a/**") == "!a/**"
+    assert _normalize_pattern("# **/**") == "# **/**"
+    # [Modify] 取反与根锚定前缀不影响 ** 段的识别
+    assert _normalize_pattern("!**/keep.log") == "!**/keep.log"
+    assert _normalize_pattern("!**/**/keep.log") == "!**/keep.log"
+    assert _normalize_pattern("/**/**/gen/") == "/**/gen/"
+    assert _normalize_pattern("!/**/***.py") == "!/**/*.py"
+
+    ignore_file = tmp_path / ".mergeignore"
+    ignore_file.write_text("**/**/**/*.log\n", encoding="utf-8")
+    spec = load_ignore_spec(ignore_file)
+
+    assert spec.match_file("app.log") is True
+    assert spec.match_file("a/b/c/app.log") is True
+    assert spec.match_file("a/b/c/app.py") is False
+
+    rules = ["*.log", "!**/keep.log", "!**/**/other.log"]
+    ignore_file.write_text("\n".join(rules), encoding="utf-8")
+    spec = load_ignore_spec(ignore_file)
+    reference = pathspec.GitIgnoreSpec.from_lines(rules)
+    for p in ["keep.log", "a/b/keep.log", "other.log", "a/other.log", "a/drop.log"]:
+        assert spec.match_file(p) is reference.match_file(p), p
+
 # --- 2. Scanner Tests ---
 
-def test_scanner_pruning_performance(tmp_path):
+def test_scanner_pruning_performance(tmp_path, monkeypatch):
     """
     验证 os.walk 配合 PathSpec 的剪枝能力。
+    [Modify] 同时统计 os.scandir 调用，确认被忽略的目录根本不会被列出。
     """
     ign_dir = tmp_path / "node_modules"
     deep_dir = ign_dir / "deep" / "nested"
@@ -71,12 +174,94 @@ def test_scanner_pruning_performance(tmp_path):
     spec = pathspec.PathSpec.from_lines("gitwildmatch", ["node_modules/"])
     extensions = {"*"}
     
+    scanned_dirs = []
+    real_scandir = os.scandir
+    def counting_scandir(path):
+        scanned_dirs.append(os.fspath(path))
+        return real_scandir(path)
+    monkeypatch.setattr(os, "scandir", counting_scandir)
+
     scanner = ProjectScanner(tmp_path, spec, extensions)
     results = list(scanner.scan())
     paths = [f.rel_path for f in results]
     
     assert "main.py" in paths
     assert "node_modules/deep/nested/index.js" not in paths
+    # 只列出了根目录，node_modules 及其子目录从未被 scandir
+    assert len(scanned_dirs) == 1
+    assert not any("node_modules" in d for d in scanned_dirs)
+
+def test_scanner_literal_dir_prune(tmp_path, mkfile, monkeypatch):
+    """
+    [New] 验证纯名称规则（如 node_modules/）按目录名直接剪枝：
+    1000 个兄弟目录下的 node_modules 都不会交给 match_files 匹配，也不会被列出。
+    """
+    for i in range(1000):
+        mkfile(tmp_path / f"pkg{i}" / "node_modules" / "dep" / "index.js", b"x")
+    mkfile(tmp_path / "main.py", b"print('ok')")
+    ignore_file = mkfile(tmp_path / ".mergeignore", b"node_modules/\n.mergeignore\n")
+    spec = load_ignore_spec(ignore_file)
+    assert "node_modules" in spec.literal_dir_names
+
+    matched = []
+    real_match_files = spec.match_files
+    def recording_match_files(files):
+        files = list(files)
+        matched.extend(files)
+        return real_match_files(files)
+    monkeypatch.setattr(spec, "match_files", recording_match_files)
+
+    paths = [f.rel_path for f in ProjectScanner(tmp_path, spec, {"*"}).scan()]
+
+    assert paths == ["main.py"]
+    assert not any("node_modules" in p for p in matched)
+
+def test_scanner_extension_filter(tmp_path):
+    """
+    [New] 验证指定扩展名时只保留匹配的文件，且剪枝同样生效。
+    """
+    deep_dir = tmp_path / "node_modules" / "deep"
+    deep_dir.mkdir(parents=True)
+    (deep_dir / "index.js").write_text("console.log('heavy')", encoding="utf-8")
+    (tmp_path / "main.py").write_text("print('ok')", encoding="utf-8")
+    (tmp_path / "app.js").write_text("run()", encoding="utf-8")
+    (tmp_path / "README.md").write_text("# doc", encoding="utf-8")
+
+    spec = pathspec.PathSpec.from_lines("gitwildmatch", ["node_modules/"])
+    scanner = ProjectScanner(tmp_path, spec, {".py", ".js"})
+    paths = [f.rel_path for f in scanner.scan()]
+
+    assert paths == ["app.js", "main.py"]
+
+def test_scanner_pruning_with_negation(tmp_path):
+    """
+    [New] 验证含 ! 取反规则时剪枝仍然正确（与 git 行为一致）：
+    被排除目录内的文件不能被重新包含，但 dir/* 形式的规则可以。
+    """
+    (tmp_path / "logs").mkdir()
+    (tmp_path / "logs" / "app.log").write_text("drop", encoding="utf-8")
+    (tmp_path / "logs" / "keep.log").write_text("keep", encoding="utf-8")
+    (tmp_path / "build").mkdir()
+    (tmp_path / "build" / "keep.txt").write_text("drop", encoding="utf-8")
+
+    ignore_file = tmp_path / ".mergeignore"
+    ignore_file.write_text("logs/*\n!logs/keep.log\nbuild/\n!build/keep.txt\n.mergeignore\n", encoding="utf-8")
+    spec = load_ignore_spec(ignore_file)
+
+    paths = [f.rel_path for f in ProjectScanner(tmp_path, spec, {"*"}).scan()]
+
+    assert paths == ["logs/keep.log"]
+
+def test_scanner_order_matches_tree(tmp_path, mkfile):
+    """[New] 验证扫描结果按路径分段排序，与项目树的渲染顺序一致（a/ 在 a-c.py、a.b 之前）"""
+    for rel_path in ["a/x.py", "a-c.py", "a.b", "b.py"]:
+        mkfile(tmp_path / rel_path, b"x = 1")
+
+    paths = [f.rel_path for f in ProjectScanner(tmp_path, pathspec.PathSpec([]), {"*"}).scan()]
+
+    assert paths == ["a/x.py", "a-c.py", "a.b", "b.py"]
+    tree_names = [line.split()[-1] for line in generate_project_tree(paths, "root").splitlines()[1:]]
+    assert tree_names == ["a", "x.py", "a-c.py", "a.b", "b.py"]
 
 def test_scanner_wildcard_glob(tmp_path):
     """
@@ -103,6 +288,12 @@ def test_scanner_binary_guard(tmp_path):
     assets.mkdir()
     (assets / "info.txt").write_text("text", encoding="utf-8")
     (assets / "logo.png").write_bytes(b"PNG\x00\x00") # Binary
+    # [New] 1 MiB 文本保留；1 MiB 无 NUL 的控制字节文件按文本字符比例判为二进制
+    (assets / "big.txt").write_text(("y" * 63 + "\n") * (1 << 14), encoding="utf-8")
+    (assets / "blob.bin").write_bytes(bytes(range(1, 32)) * ((1 << 20) // 31))
+    # [Modify] 签名之后是合法 UTF-8 文本：只能由文件头魔数判定为二进制
+    (assets / "anim.gif").write_bytes(b"GIF89a" + b"a" * 64)
+    (assets / "doc.pdf").write_bytes(b"%PDF-1.4\n" + b"1 0 obj\n" * 8)
 
     spec = pathspec.PathSpec.from_lines("gitwildmatch", []) # Nothing ignored
     extensions = {"*"}
@@ -113,9 +304,170 @@ def test_scanner_binary_guard(tmp_path):
     
     assert "assets/info.txt" in paths
     assert "assets/logo.png" not in paths
+    assert "assets/big.txt" in paths
+    assert "assets/blob.bin" not in paths
+    assert "assets/anim.gif" not in paths
+    assert "assets/doc.pdf" not in paths
+
+    from flatcode.core.binary import is_binary_head
+    assert is_binary_head(b"\xff\xd8\xff\xe0" + b"JFIF" * 64)
+    assert is_binary_head(b"GIF89a" + b"a" * 64)
+    assert not is_binary_head(b"GIF is a format\n")
+
+def test_project_tree_rendering():
+    """[New] 验证线性生成的目录树：排序、连接符与缩进"""
+    paths = ["src/b.py", "README.md", "src/a/x.py", "tests/t.py", "src/a/y.py"]
+
+    tree = generate_project_tree(paths, "proj")
+
+    assert tree == (
+        "proj/\n"
+        "├── README.md\n"
+        "├── src\n"
+        "│   ├── a\n"
+        "│   │   ├── x.py\n"
+        "│   │   └── y.py\n"
+        "│   └── b.py\n"
+        "└── tests\n"
+        "    └── t.py\n"
+    )
+
+def test_file_context_pickle_and_copy():
+    """[New] 验证带 __slots__ 的冻结 FileContext 可以 pickle 往返并 deepcopy"""
+    import copy
+    import pickle
+    from flatcode.models import FileContext
+
+    fc = FileContext(abs_path="/tmp/a.py", rel_path="a.py", token_count=3, size=12)
+
+    assert pickle.loads(pickle.dumps(fc)) == fc
+    assert copy.deepcopy(fc) == fc
+    assert copy.copy(fc).path == Path("/tmp/a.py")
+
+def test_scanner_fast_tokens(tmp_path):
+    """[New] 验证 fast_tokens 模式按字节数 / 4 估算 token"""
+    (tmp_path / "main.py").write_text("x" * 400, encoding="utf-8")
+
+    spec = pathspec.PathSpec.from_lines("gitwildmatch", [])
+    scanner = ProjectScanner(tmp_path, spec, {"*"}, fast_tokens=True)
+    results = list(scanner.scan())
+
+    assert [(f.rel_path, f.token_count, f.size) for f in results] == [("main.py", 100, 400)]
+
+def test_token_cache_reuse(tmp_path):
+    """[New] 验证 token 缓存：未修改的文件直接复用缓存计数，修改后失效"""
+    from flatcode.utils.cache import TokenCache
+
+    project = tmp_path / "project"
+    project.mkdir()
+    main_py = project / "main.py"
+    main_py.write_text("print('hello')", encoding="utf-8")
+    st = main_py.stat()
+
+    cache = TokenCache(project, "test_encoding", cache_dir=tmp_path / "cache")
+    cache.put("main.py", st.st_mtime_ns, st.st_size, 12345)
+    cache.save()
+
+    # 新实例从磁盘加载；扫描时命中缓存，不重新计算
+    cache = TokenCache(project, "test_encoding", cache_dir=tmp_path / "cache")
+    spec = pathspec.PathSpec.from_lines("gitwildmatch", [])
+    results = list(ProjectScanner(project, spec, {"*"}, token_cache=cache).scan())
+    assert [f.token_count for f in results] == [12345]
+
+    # 文件大小改变后缓存失效；不同 encoding 的缓存被丢弃
+    assert cache.get("main.py", st.st_mtime_ns, st.st_size + 1) is None
+    other = TokenCache(project, "other_encoding", cache_dir=tmp_path / "cache")
+    assert other.get("main.py", st.st_mtime_ns, st.st_size) is None
+
+def test_scanner_fast_tokens_bypass_cache(tmp_path):
+    """[New] 验证 fast_tokens 模式既不读取也不写入 token 缓存，估算值不会污染精确计数"""
+    from flatcode.utils.cache import TokenCache
+
+    project = tmp_path / "project"
+    project.mkdir()
+    main_py = project / "main.py"
+    main_py.write_text("print('hello')", encoding="utf-8")
+    st = main_py.stat()
+    spec = pathspec.PathSpec.from_lines("gitwildmatch", [])
+
+    cache = TokenCache(project, "test_encoding", cache_dir=tmp_path / "cache")
+    cache.put("main.py", st.st_mtime_ns, st.st_size, 12345)
+    cache.save()
+
+    cache = TokenCache(project, "test_encoding", cache_dir=tmp_path / "cache")
+    results = list(ProjectScanner(project, spec, {"*"}, fast_tokens=True, token_cache=cache).scan())
+    assert [f.token_count for f in results] == [st.st_size // 4]
+
+    # 缓存中仍是原来的精确计数，没有被估算值覆盖
+    cache = TokenCache(project, "test_encoding", cache_dir=tmp_path / "cache")
+    assert cache.get("main.py", st.st_mtime_ns, st.st_size) == 12345
+
+@pytest.mark.parametrize("payload", [
+    "[]",
+    '{"version": 1, "encoding": "test_encoding", "entries": []}',
+    '{"version": 1, "encoding": "test_encoding", "entries": {"main.py": 7}}',
+    '{"version": 1, "encoding": "test_encoding", "entries": {"main.py": [1, 2]}}',
+])
+def test_token_cache_malformed_file(tmp_path, payload):
+    """[New] 验证格式错误的缓存文件被整体丢弃，扫描照常进行且不丢文件"""
+    from flatcode.utils.cache import TokenCache
+
+    project = tmp_path / "project"
+    project.mkdir()
+    (project / "main.py").write_text("print('hello')", encoding="utf-8")
+
+    cache = TokenCache(project, "test_encoding", cache_dir=tmp_path / "cache")
+    cache.cache_file.parent.mkdir(parents=True)
+    cache.cache_file.write_text(payload, encoding="utf-8")
+
+    cache = TokenCache(project, "test_encoding", cache_dir=tmp_path / "cache")
+    spec = pathspec.PathSpec.from_lines("gitwildmatch", [])
+    results = list(ProjectScanner(project, spec, {"*"}, token_cache=cache).scan())
+    assert [f.rel_path for f in results] == ["main.py"]
 
 # --- 3. CLI Integration ---
 
+@pytest.mark.parametrize("use_sendfile", [True, False])
+def test_write_context_large_files(tmp_path, mkfile, monkeypatch, use_sendfile):
+    """
+    [New] 验证大文件走 sendfile（或 copyfileobj 回退）直接拷贝时，输出字节与原文件完全一致，
+    且与小文件的缓冲写入路径正确交错。
+    """
+    monkeypatch.setattr(writer, "_HAS_FILE_SENDFILE", use_sendfile and writer._HAS_FILE_SENDFILE)
+    big = ("print('x')\n" * (writer.SENDFILE_MIN_SIZE // 8)).encode("utf-8")
+    mkfile(tmp_path / "a.py", b"small = 1")
+    mkfile(tmp_path / "big.py", big)
+    mkfile(tmp_path / "z.py", b"tail = 2")
+
+    files = list(ProjectScanner(tmp_path, pathspec.PathSpec([]), {".py"}, fast_tokens=True).scan())
+    output_file = tmp_path / "out.txt"
+    writer.write_context(output_file, files, "tree\n", 0)
+
+    data = output_file.read_bytes()
+    assert data.endswith(
+        b"--- File: a.py ---\n\nsmall = 1\n\n--- End: a.py ---\n\n"
+        b"--- File: big.py ---\n\n" + big + b"\n\n--- End: big.py ---\n\n"
+        b"--- File: z.py ---\n\ntail = 2\n\n--- End: z.py ---\n\n"
+    )
+
+def test_write_context_counts_written_files(tmp_path, mkfile, capsys):
+    """[New] 验证扫描后消失的文件不计入输出头部的 Files / Tokens 统计"""
+    for name in ["a.py", "b.py", "c.py"]:
+        mkfile(tmp_path / name, b"x = 1\n" * 4)
+    files = list(ProjectScanner(tmp_path, pathspec.PathSpec([]), {".py"}, fast_tokens=True).scan())
+    total_tokens = sum(f.token_count for f in files)
+    (tmp_path / "b.py").unlink()
+
+    output_file = tmp_path / "out.txt"
+    written = writer.write_context(output_file, files, "tree\n", total_tokens)
+
+    kept_tokens = files[0].token_count + files[2].token_count
+    assert written == (2, kept_tokens)
+    header = output_file.read_text(encoding="utf-8").splitlines()[1]
+    assert header.split() == ["#", "Files:", "2", "|", "Tokens:", str(kept_tokens)]
+    assert "--- File: b.py ---" not in output_file.read_text(encoding="utf-8")
+    assert "Skipping b.py" in capsys.readouterr().err
+
 def test_cli_integration(complex_project, monkeypatch):
     output_file = complex_project / "output.txt"
     test_args = ["flatcode", str(complex_project), "-o", output_file.name, "-y"]
@@ -185,4 +537,45 @@ def test_mergeignore_no_duplication(tmp_path):
     # 3. 验证没有重复添加
     content = ignore_file.read_text(encoding="utf-8")
     # 应该只出现一次（即原有的规则），不会有具体的 my_project_context.txt
-    assert "my_project_context.txt" not in content
\ No newline at end of file
+    assert "my_project_context.txt" not in content
+
+def test_mergeignore_bootstrap_non_interactive(tmp_path, monkeypatch):
+    """
+    [New] 验证 assume_yes 时不调用 input()，直接复制 .gitignore 规则。
+    """
+    (tmp_path / ".gitignore").write_text("secret/\n", encoding="utf-8")
+
+    def fail_input(_):
+        raise AssertionError("input() should not be called")
+    monkeypatch.setattr("builtins.input", fail_input)
+
+    from flatcode.core.ignore import bootstrap_mergeignore
+    mergeignore_file = bootstrap_mergeignore(tmp_path, "out_context.txt", assume_yes=True)
+
+    content = mergeignore_file.read_text(encoding="utf-8")
+    assert "secret/" in content
+    assert "out_context.txt" in content
+
+def test_mergeignore_atomic_write_leftovers(tmp_path, mkfile):
+    """
+    [New] 验证原子写入：遗留的临时文件不影响新建 .mergeignore，也不会被扫描进输出；
+    新文件权限遵循 umask，而不是 mkstemp 的 0600。
+    """
+    from flatcode.core.ignore import bootstrap_mergeignore
+    leftover = mkfile(tmp_path / ".flatcode-stale.tmp", b"half written")
+    mkfile(tmp_path / "main.py", b"print('ok')")
+
+    old_umask = os.umask(0o022)
+    try:
+        mergeignore_file = bootstrap_mergeignore(tmp_path, "out_context.txt", assume_yes=True)
+    finally:
+        os.umask(old_umask)
+
+    assert mergeignore_file.stat().st_mode & 0o777 == 0o644
+    assert leftover.exists()
+    assert [p.name for p in tmp_path.glob(".flatcode-*.tmp")] == [".flatcode-stale.tmp"]
+
+    spec = load_ignore_spec(mergeignore_file)
+    paths = [f.rel_path for f in ProjectScanner(tmp_path, spec, {"*"}).scan()]
+    assert ".flatcode-stale.tmp" not in paths
+    assert "main.py" in paths